@@ -11,7 +11,35 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import importlib
+from typing import TYPE_CHECKING
+
 from amzn_nova_prompt_optimizer.core.optimizers.adapter import OptimizationAdapter
 from amzn_nova_prompt_optimizer.core.optimizers.nova_meta_prompter.nova_mp_optimizer import NovaMPOptimizationAdapter
-from amzn_nova_prompt_optimizer.core.optimizers.miprov2.miprov2_optimizer import MIPROv2OptimizationAdapter
-from amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer import NovaPromptOptimizer
+
+if TYPE_CHECKING:
+    from amzn_nova_prompt_optimizer.core.optimizers.miprov2.miprov2_optimizer import MIPROv2OptimizationAdapter
+    from amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer import (
+        NovaPromptOptimizer)
+
+# The MIPROv2 based optimizers import dspy, which takes seconds to load. They are imported on first access so
+# that using the Meta Prompter or the base adapters does not pay for it.
+_LAZY_OPTIMIZERS = {
+    "MIPROv2OptimizationAdapter": "amzn_nova_prompt_optimizer.core.optimizers.miprov2.miprov2_optimizer",
+    "NovaPromptOptimizer": "amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer",
+}
+
+__all__ = ["OptimizationAdapter", "NovaMPOptimizationAdapter", *_LAZY_OPTIMIZERS]
+
+
+def __getattr__(name):
+    if name in _LAZY_OPTIMIZERS:
+        value = getattr(importlib.import_module(_LAZY_OPTIMIZERS[name]), name)
+        # Bind the class on the package so later lookups no longer go through __getattr__
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_OPTIMIZERS))
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import dspy  # type: ignore
+from litellm import RateLimitError
 
 from amzn_nova_prompt_optimizer.util.rate_limiter import RateLimiter
 
@@ -37,9 +38,17 @@ class RateLimitedLM(dspy.LM):
 
     def __call__(self, *args, **kwargs):
         # Apply rate limiting before making the actual model call
-        self.rate_limiter.apply_rate_limiting()
+        request_time = self.rate_limiter.apply_rate_limiting()
         # Delegate to the wrapped model
-        return self.wrapped_model(*args, **kwargs)
+        try:
+            return self.wrapped_model(*args, **kwargs)
+        except RateLimitError:
+            # Throttled calls reached Bedrock and used quota, keep their slot so retries stay spaced out
+            raise
+        except Exception:
+            # Other failed calls should not keep counting against the rate limit
+            self.rate_limiter.release_request_slot(request_time)
+            raise
 
     def __getattr__(self, name):
         # Delegate attribute access to the wrapped model to make it act like origin dspy.LM
@@ -11,8 +11,13 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import hashlib
+import json
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import closing
+from functools import partial
 
 from amzn_nova_prompt_optimizer.core.inference import InferenceAdapter, MAX_TOKENS_FIELD, TEMPERATURE_FIELD, \
     TOP_P_FIELD, TOP_K_FIELD
@@ -26,10 +31,15 @@ from amzn_nova_prompt_optimizer.core.input_adapters.prompt_adapter import (Promp
 from amzn_nova_prompt_optimizer.core.optimizers import OptimizationAdapter
 from amzn_nova_prompt_optimizer.core.optimizers.nova_meta_prompter.nova_prompt_template import NOVA_PROMPT_TEMPLATE
 
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 
 logger = logging.getLogger(__name__)
 DEFAULT_PROMPTER_MODEL_ID = "us.amazon.nova-premier-v1:0"
+SYSTEM_PROMPT_TAG_PATTERN = re.compile(r"<system_prompt>(.*?)</system_prompt>", re.DOTALL)
+USER_PROMPT_TAG_PATTERN = re.compile(r"<user_prompt>(.*?)</user_prompt>", re.DOTALL)
+OPTIMIZED_PROMPT_CACHE_SIZE = 256
+# Short fingerprint of the static meta prompt, logged to tell template revisions apart
+NOVA_PROMPT_TEMPLATE_VERSION = hashlib.sha256(NOVA_PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:8]
 
 class NovaMPOptimizationAdapter(OptimizationAdapter):
     def __init__(self, prompt_adapter: PromptAdapter,
@@ -39,52 +49,124 @@ class NovaMPOptimizationAdapter(OptimizationAdapter):
         # Call parent class's __init__
         super().__init__(prompt_adapter, inference_adapter, dataset_adapter, metric_adapter)
         self.inference_config = {MAX_TOKENS_FIELD: 5000, TEMPERATURE_FIELD: 1.0, TOP_P_FIELD: 1.0, TOP_K_FIELD: 1}
+        # Valid (system prompt, user prompt) pairs keyed by a hash of the prompter request
+        self._optimized_prompt_cache: Dict[bytes, Tuple[str, str]] = {}
 
 
-    def optimize(self, prompter_model_id: str = DEFAULT_PROMPTER_MODEL_ID, max_retries: int = 5):
+    def optimize(self, prompter_model_id: str = DEFAULT_PROMPTER_MODEL_ID, max_retries: int = 5,
+                 num_parallel_attempts: int = 1, use_cache: bool = True):
+        """
+        Optimize the prompt using the Nova Meta Prompter.
+
+        :param prompter_model_id: Model used to rewrite the prompt
+        :param max_retries: Maximum number of prompter calls made before falling back to the last response
+        :param num_parallel_attempts: Number of prompter calls kept in flight at once. The first response that
+                                      keeps all prompt variables is used and the queued calls are cancelled.
+        :param use_cache: Reuse the optimized prompt of an earlier identical request instead of calling the model
+        :return: An optimized PromptAdapter
+        """
         logger.info(f"Optimizing prompt using Nova Meta Prompter with Model: {prompter_model_id}")
+        logger.debug(f"Using Nova Meta Prompter template version {NOVA_PROMPT_TEMPLATE_VERSION}")
         if not self.inference_adapter:
             raise ValueError("Inference Adapter not passed. "
                              "Initialize and Pass Inference Adapter to use this Optimizer")
 
-        # Add the User Prompt Variables to the Prompt Template to not drop them
-        user_component = self.prompt_adapter.fetch().get(USER_PROMPT_COMPONENT, {})
+        standardized_prompt = self.prompt_adapter.fetch()
+
+        # Add the User Prompt Variables to the Prompt Template to not drop them.
+        # Variables are sorted so the rendered meta prompt does not change between runs.
+        user_component = standardized_prompt.get(USER_PROMPT_COMPONENT, {})
         user_variables = user_component.get(PROMPT_VARIABLES_FIELD, [])
-        user_prompt_variables = ', '.join(f'{{{{{var}}}}}' for var in user_variables)
+        user_prompt_variables = ', '.join(f'{{{{{var}}}}}' for var in sorted(user_variables))
         nova_prompt_template = NOVA_PROMPT_TEMPLATE.replace("<USER_PROMPT_VARIABLES>", user_prompt_variables)
 
         # Add the System Prompt Variables to the Prompt Template to not drop them
-        system_component = self.prompt_adapter.fetch().get(SYSTEM_PROMPT_COMPONENT, {})
+        system_component = standardized_prompt.get(SYSTEM_PROMPT_COMPONENT, {})
         system_variables = system_component.get(PROMPT_VARIABLES_FIELD, [])
-        system_prompt_variables = ', '.join(f'{{{{{var}}}}}' for var in system_variables)
+        system_prompt_variables = ', '.join(f'{{{{{var}}}}}' for var in sorted(system_variables))
         nova_prompt_template = nova_prompt_template.replace("<SYSTEM_PROMPT_VARIABLES>", system_prompt_variables)
 
         last_optimized_prompt = None
+        last_system_prompt, last_user_prompt = None, None
         all_variables = system_variables + user_variables
         overall_prompt_template = (self.prompt_adapter.fetch_system_template() + "\n\n"
                                 + self.prompt_adapter.fetch_user_template())
 
         messages = [{"user": overall_prompt_template}]
-        for attempt in range(max_retries):
-            optimized_prompt = self.inference_adapter.call_model(prompter_model_id,
-                                                                 nova_prompt_template,
-                                                                 messages,
-                                                                 self.inference_config)
-            last_optimized_prompt = optimized_prompt
-            system_prompt, user_prompt = self._split_prompt(optimized_prompt)
-            if (self._validate_system_prompt(system_prompt, all_variables)
-                    and self._validate_user_prompt(user_prompt, all_variables)):
-                return self._create_optimized_prompt_adapter(system_prompt, user_prompt, all_variables)
-            logger.warning(f"Attempt {attempt + 1}: Optimized prompt does not contain all variables. Retrying...")
+        cache_key = self._get_cache_key(prompter_model_id, nova_prompt_template, messages)
+        if use_cache and cache_key in self._optimized_prompt_cache:
+            logger.info("Found optimized prompt for identical request in cache, skipping model call")
+            system_prompt, user_prompt = self._optimized_prompt_cache[cache_key]
+            return self._create_optimized_prompt_adapter(system_prompt, user_prompt, all_variables)
+
+        call_prompter = partial(self.inference_adapter.call_model, prompter_model_id, nova_prompt_template,
+                                messages, self.inference_config)
+
+        with closing(self._generate_prompter_responses(call_prompter, max_retries, num_parallel_attempts)) as responses:
+            for attempt, optimized_prompt in enumerate(responses, start=1):
+                last_optimized_prompt = optimized_prompt
+                system_prompt, user_prompt = self._split_prompt(optimized_prompt)
+                last_system_prompt, last_user_prompt = system_prompt, user_prompt
+                if (self._validate_system_prompt(system_prompt, all_variables)
+                        and self._validate_user_prompt(user_prompt, all_variables)):
+                    self._cache_optimized_prompt(cache_key, system_prompt, user_prompt)
+                    return self._create_optimized_prompt_adapter(system_prompt, user_prompt, all_variables)
+                logger.warning(f"Attempt {attempt}: Optimized prompt does not contain all variables. Retrying...")
         logger.warning("Failed to generate a valid optimized prompt after maximum retries. "
                        "Using last generated prompt and appending variables to the end")
 
         if not last_optimized_prompt:
             raise ValueError("[Optimization Error] Failure in optimization, please re-run the optimizer.")
 
-        system_prompt, user_prompt = self._split_prompt(last_optimized_prompt)
-        user_prompt = self._format_prompt_with_variables(user_prompt, all_variables)
-        return self._create_optimized_prompt_adapter(system_prompt, user_prompt, all_variables)
+        # Reuse the split of the last response rather than parsing it again
+        user_prompt = self._format_prompt_with_variables(last_user_prompt, all_variables)
+        return self._create_optimized_prompt_adapter(last_system_prompt, user_prompt, all_variables)
+
+    @staticmethod
+    def _generate_prompter_responses(call_prompter, max_retries: int, num_parallel_attempts: int):
+        """
+        Yield prompter responses until max_retries calls are made. Requesting the next response means the
+        previous one was rejected.
+        :param call_prompter: Makes one prompter call and returns the response
+        :param max_retries: Maximum number of prompter calls
+        :param num_parallel_attempts: Number of prompter calls kept in flight at once
+        """
+        num_in_flight = min(num_parallel_attempts, max_retries)
+        if num_in_flight <= 1:
+            # One call at a time on the calling thread
+            for _ in range(max_retries):
+                yield call_prompter()
+            return
+
+        # Keep num_in_flight calls running and top up after every rejected response
+        executor = ThreadPoolExecutor(max_workers=num_in_flight)
+        try:
+            pending = {executor.submit(call_prompter) for _ in range(num_in_flight)}
+            num_submitted = num_in_flight
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    if num_submitted < max_retries:
+                        pending.add(executor.submit(call_prompter))
+                        num_submitted += 1
+        finally:
+            # Do not block on calls that are still running once a valid prompt is found
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_cache_key(self, prompter_model_id: str, system_prompt: str, messages: List[Dict[str, str]]) -> bytes:
+        """
+        Hash everything sent to the prompter model into a compact cache key
+        :return: 16 byte digest identifying the request
+        """
+        request = json.dumps([prompter_model_id, system_prompt, messages, self.inference_config], sort_keys=True)
+        return hashlib.blake2b(request.encode("utf-8"), digest_size=16).digest()
+
+    def _cache_optimized_prompt(self, cache_key: bytes, system_prompt: str, user_prompt: str):
+        if len(self._optimized_prompt_cache) >= OPTIMIZED_PROMPT_CACHE_SIZE:
+            # Evict the oldest entry, dicts keep insertion order
+            del self._optimized_prompt_cache[next(iter(self._optimized_prompt_cache))]
+        self._optimized_prompt_cache[cache_key] = (system_prompt, user_prompt)
 
     def _create_optimized_prompt_adapter(self, system_prompt: str, user_prompt: str, all_variables: List[str]) -> PromptAdapter:
         optimized_prompt_adapter = self.prompt_adapter.__class__()
@@ -101,11 +183,8 @@ class NovaMPOptimizationAdapter(OptimizationAdapter):
         :return: System Prompt, and User Prompt
         """
         try:
-            system_pattern = r"<system_prompt>(.*?)</system_prompt>"
-            user_pattern = r"<user_prompt>(.*?)</user_prompt>"
-
-            system_match = re.search(system_pattern, prompt, re.DOTALL)
-            user_match = re.search(user_pattern, prompt, re.DOTALL)
+            system_match = SYSTEM_PROMPT_TAG_PATTERN.search(prompt)
+            user_match = USER_PROMPT_TAG_PATTERN.search(prompt)
 
             if not system_match or not user_match:
                 return None, None
@@ -130,7 +209,7 @@ class NovaMPOptimizationAdapter(OptimizationAdapter):
         if not variables:  # If no variables to check, prompt is valid
             return True
         used_vars = set(PROMPT_VARIABLE_PATTERN.findall(prompt))
-        return used_vars.issuperset(set(variables))
+        return used_vars.issuperset(variables)
 
     @staticmethod
     def _validate_system_prompt(prompt: str, variables: List[str]) -> bool:
@@ -145,7 +224,7 @@ class NovaMPOptimizationAdapter(OptimizationAdapter):
         if not variables:  # If no variables to check, prompt is valid
             return True
         used_vars = set(PROMPT_VARIABLE_PATTERN.findall(prompt))
-        return not used_vars.issuperset(set(variables))
+        return not used_vars.issuperset(variables)
 
     @staticmethod
     def _format_prompt_with_variables(prompt: str, variables: List[str]) -> str:
@@ -155,7 +234,7 @@ class NovaMPOptimizationAdapter(OptimizationAdapter):
         :return: formatted prompt
         """
         used_vars = set(PROMPT_VARIABLE_PATTERN.findall(prompt))
-        missing_vars = set(variables) - used_vars
+        missing_vars = sorted(set(variables) - used_vars)
         # Append missing variables
         if missing_vars:
             prompt += "\n\nHere are the additional inputs:\n"
@@ -24,6 +24,11 @@ from amzn_nova_prompt_optimizer.core.optimizers.miprov2.miprov2_optimizer import
 
 logger = logging.getLogger(__name__)
 
+# Matches the MIPROv2OptimizationAdapter default, used when rate limiting is disabled
+DEFAULT_NUM_THREADS = 2
+# Upper bound on evaluation threads derived from the rate limit
+MAX_NUM_THREADS = 32
+
 NOVA_PROMPT_OPTIMIZER_MODE: Dict[str, Dict[str, Any]] = {
     "micro": {
         "meta_prompt_model_id": "us.amazon.nova-premier-v1:0",
@@ -119,5 +124,15 @@ class NovaPromptOptimizer(OptimizationAdapter):
             metric_adapter=self.metric_adapter,
             inference_adapter=self.inference_adapter)
 
+        # Evaluate the dataset on one thread per request the rate limit allows, unless overridden in custom_params.
+        # Threads that exceed the limit wait inside the rate limiter, so this only hides network latency.
+        # Never more threads than MAX_NUM_THREADS or dataset rows, the extra ones would sit idle.
+        optimization_params = {"num_threads": self._get_num_threads(), **optimization_params}
         optimized_prompt_adapter = nova_prompt_optimizer.optimize(**optimization_params, enable_json_fallback=False)
         return optimized_prompt_adapter
+
+    def _get_num_threads(self) -> int:
+        rate_limit = self.inference_adapter.rate_limit
+        if rate_limit <= 0:
+            return DEFAULT_NUM_THREADS
+        return max(1, min(rate_limit, MAX_NUM_THREADS, len(self.dataset_adapter.fetch())))
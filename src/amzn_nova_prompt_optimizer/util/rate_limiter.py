@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
-import random
 import threading
+from collections import deque
+from typing import Optional
 
 import time
 
@@ -26,38 +27,92 @@ class RateLimiter:
     def __init__(self, rate_limit: int = 2):
         self.rate_limit = rate_limit
         self.logger = logging.getLogger(__name__)
-        self.request_timestamps: list[float] = []  # Track request timestamps in sliding window
-        self.waiting_requests_count = 0  # Count of requests waiting for rate limit
+        self.request_timestamps: deque[float] = deque()  # Monotonic request times in sliding window, oldest first
+        self._waiters: deque[object] = deque()  # Tickets of waiting requests, admitted in arrival order
         self._lock = threading.Lock()  # Thread safety lock
+        self._slot_freed = threading.Condition(self._lock)  # Wakes waiting requests when the queue moves
 
-    def apply_rate_limiting(self):
+    @property
+    def waiting_requests_count(self) -> int:
+        """
+        Count of requests waiting for rate limit.
+        """
+        return len(self._waiters)
+
+    def apply_rate_limiting(self) -> Optional[float]:
+        """
+        Wait until the request fits in the rate limit and record it.
+
+        Requests that have to wait are admitted in arrival order, a new request never takes a free slot while
+        others are waiting for one.
+
+        :return: Timestamp recorded for this request, None when rate limiting is disabled
+        """
         if self.rate_limit <= 0:
             # Disable rate limit when rate_limit <=0
-            return
+            return None
 
         with self._lock:  # Ensure thread safety for all shared state access
-            current_time = time.time()
+            ticket = None
+            try:
+                while True:
+                    current_time = time.monotonic()
 
-            # Clean up old timestamps - only keep requests from the last 1 second
-            self.request_timestamps = [ts for ts in self.request_timestamps if current_time - ts < 1.0]
+                    # Clean up old timestamps - only keep requests from the last 1 second. Timestamps are appended
+                    # in order, so expired ones are always at the front
+                    window_size = len(self.request_timestamps)
+                    while self.request_timestamps and current_time - self.request_timestamps[0] >= 1.0:
+                        self.request_timestamps.popleft()
+                    if len(self.request_timestamps) < window_size and self._waiters and self._waiters[0] is not ticket:
+                        # Freed slots belong to the requests ahead of this one
+                        self._slot_freed.notify_all()
 
-            # Check if we've exceeded the rate limit
-            if len(self.request_timestamps) >= self.rate_limit:
-                self.waiting_requests_count += 1
+                    # Under the rate limit and first in line, record this request's timestamp and go
+                    if len(self.request_timestamps) < self.rate_limit and \
+                            (not self._waiters or self._waiters[0] is ticket):
+                        self.request_timestamps.append(current_time)
+                        return current_time
 
-                # Calculate sleep time with exponential backoff and jitter
-                # Formula accounts for: queue position, time window, and randomization
-                sleep_time = (((self.waiting_requests_count / self.rate_limit) * 1.0) -
-                              (current_time - self.request_timestamps[0]) + random.uniform(0, 1))
+                    if ticket is None:
+                        ticket = object()
+                        self._waiters.append(ticket)
 
-                if sleep_time > 0:
-                    self.logger.debug(f"Exceed rate limit, retry in {sleep_time} seconds...")
-                    time.sleep(sleep_time)
+                    # With the window full, no slot can free up before the oldest request leaves it. Otherwise a
+                    # request ahead of this one gets the free slot and wakes the queue once admitted
+                    wait_time = 1.0 - (current_time - self.request_timestamps[0]) \
+                        if len(self.request_timestamps) >= self.rate_limit else None
+
+                    # Waiting releases the lock, so other requests can queue up or give back their slot meanwhile
+                    self.logger.debug(f"Exceed rate limit, {len(self._waiters)} requests waiting for a free slot...")
+                    self._slot_freed.wait(wait_time)
+            finally:
+                if ticket is not None:
+                    # Admitted or interrupted, leave the queue and let the requests behind this one move up
+                    self._waiters.remove(ticket)
+                    self._slot_freed.notify_all()
+
+    def release_request_slot(self, request_time: Optional[float]):
+        """
+        Give back the slot of a request that failed without producing a result.
+
+        :param request_time: Timestamp returned by the apply_rate_limiting() call that admitted the request.
+                             Nothing is released if it already left the sliding window.
+        """
+        if request_time is None:
+            return
+        with self._lock:
+            try:
+                self.request_timestamps.remove(request_time)
+            except ValueError:
+                return  # Already expired, the slot is free
+            # Hand the slot to the first waiting request instead of leaving it to the next new one
+            self._slot_freed.notify_all()
 
-            # Decrement waiting count and ensure it doesn't go negative
-            self.waiting_requests_count -= 1
-            if self.waiting_requests_count < 0:
-                self.waiting_requests_count = 0
+    def _set_state(self, timestamps):
+        """
+        Replace the sliding window, for tests that need to start from a given state.
 
-            # Record this request's timestamp
-            self.request_timestamps.append(time.time())
+        :param timestamps: Request times in the sliding window, oldest first
+        """
+        with self._lock:
+            self.request_timestamps = deque(map(float, timestamps))
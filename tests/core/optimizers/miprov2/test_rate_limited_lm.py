@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import Mock, patch
 
 import dspy  # type: ignore
+from litellm import RateLimitError
 
 from amzn_nova_prompt_optimizer.core.optimizers.miprov2.custom_lm.rate_limited_lm import RateLimitedLM
 
@@ -55,6 +56,54 @@ class TestRateLimitedLM(unittest.TestCase):
         self.mock_lm.assert_called_once_with("test prompt", temperature=0.7, max_tokens=100)
         self.assertEqual(result, expected_result)
 
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_call_releases_slot_on_error(self, mock_time):
+        """Test that a failed model call gives back its own rate limit slot and no other"""
+        rate_limiter = self.rate_limited_lm.rate_limiter
+
+        def admit_other_request_then_fail(other_request_time):
+            def side_effect(*args, **kwargs):
+                mock_time.monotonic.return_value = other_request_time
+                rate_limiter.apply_rate_limiting()
+                raise RuntimeError("model error")
+            return side_effect
+
+        # Another request is admitted while the call is running, only the failed call's slot is released.
+        # The window has room for both so the other request is never throttled
+        rate_limiter.rate_limit = 3
+        mock_time.monotonic.return_value = 100.0
+        rate_limiter._set_state([99.5])
+        self.mock_lm.side_effect = admit_other_request_then_fail(100.1)
+
+        with self.assertRaises(RuntimeError):
+            self.rate_limited_lm("test prompt")
+
+        self.assertEqual(list(rate_limiter.request_timestamps), [99.5, 100.1])
+
+        # The call outlived the window, its timestamp already expired and the occupied slot is kept
+        mock_time.monotonic.return_value = 100.0
+        rate_limiter._set_state([])
+        self.mock_lm.side_effect = admit_other_request_then_fail(101.2)
+
+        with self.assertRaises(RuntimeError):
+            self.rate_limited_lm("test prompt")
+
+        self.assertEqual(list(rate_limiter.request_timestamps), [101.2])
+
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_call_keeps_slot_when_throttled(self, mock_time):
+        """Test that a throttled model call keeps its rate limit slot"""
+        # Arrange
+        mock_time.monotonic.return_value = 100.0
+        self.mock_lm.side_effect = RateLimitError("throttled", "bedrock", "test-model")
+
+        # Act
+        with self.assertRaises(RateLimitError):
+            self.rate_limited_lm("test prompt")
+
+        # Assert
+        self.assertEqual(list(self.rate_limited_lm.rate_limiter.request_timestamps), [100.0])
+
     def test_getattr_delegates_to_wrapped_model(self):
         """Test that attribute access is delegated to base_model"""
         # Arrange
@@ -63,43 +112,41 @@ class TestRateLimitedLM(unittest.TestCase):
         # Act & Assert
         self.assertEqual(self.rate_limited_lm.some_attribute, "test_value")
 
-    @patch('time.time')
-    @patch('time.sleep')
-    def test_apply_rate_limiting_no_limit_reached(self, mock_sleep, mock_time):
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_no_limit_reached(self, mock_time):
         """Test rate limiting with multiple calls in quick succession"""
         # Mock time to simulate calls within 1 second
-        mock_time.return_value = 100.0
+        mock_time.monotonic.return_value = 100.0
+        self.rate_limited_lm.rate_limiter._slot_freed = Mock()
         self.rate_limited_lm.rate_limiter.rate_limit = 5
 
         # Add some timestamps that are within rate limit
-        self.rate_limited_lm.rate_limiter.request_timestamps = [99.5, 99.7, 99.9]  # 3 requests in last second
+        self.rate_limited_lm.rate_limiter._set_state([99.5, 99.7, 99.9])  # 3 requests in last second
 
         # Act
         self.rate_limited_lm.__call__()
 
         # Assert
-        mock_sleep.assert_not_called()
+        self.rate_limited_lm.rate_limiter._slot_freed.wait.assert_not_called()
         self.assertEqual(len(self.rate_limited_lm.rate_limiter.request_timestamps), 4)  # Original 3 + 1 new
         self.assertEqual(self.rate_limited_lm.rate_limiter.waiting_requests_count, 0)
 
-    @patch('time.time')
-    @patch('time.sleep')
-    @patch('random.uniform')
-    def test_apply_rate_limiting_limit_reached(self, mock_random, mock_sleep, mock_time):
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_limit_reached(self, mock_time):
         """Test rate limiting when limit is reached"""
         # Arrange
-        mock_time.side_effect = [100.0, 100.0, 100.1]  # Current time calls
-        mock_random.return_value = 0.9
+        mock_time.monotonic.side_effect = [100.0, 100.8]  # Before and after waiting
+        self.rate_limited_lm.rate_limiter._slot_freed = Mock()
         self.rate_limited_lm.rate_limiter.rate_limit = 3
 
         # Fill up to rate limit
-        self.rate_limited_lm.rate_limiter.request_timestamps = [99.5, 99.7, 99.9]  # 3 requests in last second
+        self.rate_limited_lm.rate_limiter._set_state([99.5, 99.7, 99.9])  # 3 requests in last second
 
         # Act
         self.rate_limited_lm.__call__()
 
         # Assert
-        mock_sleep.assert_called_once()
-        # Verify sleep time is positive (exact value depends on random component)
-        sleep_args = mock_sleep.call_args[0]
-        self.assertGreater(sleep_args[0], 0)
+        self.rate_limited_lm.rate_limiter._slot_freed.wait.assert_called_once()
+        # Verify wait time is positive
+        wait_args = self.rate_limited_lm.rate_limiter._slot_freed.wait.call_args[0]
+        self.assertGreater(wait_args[0], 0)
@@ -1,3 +1,4 @@
+import threading
 import unittest
 from unittest.mock import Mock, patch
 
@@ -133,5 +134,107 @@ class TestNovaMPOptimizationAdapter(unittest.TestCase):
 
         # Assertions
         self.assertEqual(self.inference_adapter.call_model.call_count, 2)
+        self.prompt_adapter.fetch.assert_called_once()
         self.prompt_adapter.fetch_system_template.assert_called_once()
         self.prompt_adapter.fetch_user_template.assert_called_once()
+
+    def test_optimize_parallel_attempts(self):
+        """Test parallel attempts run concurrently and no more calls start once a valid response arrives"""
+        self.prompt_adapter.fetch.return_value = {
+            'system': {'variables': []},
+            'user': {'variables': []}
+        }
+        self.prompt_adapter.fetch_system_template.return_value = "System template"
+        self.prompt_adapter.fetch_user_template.return_value = "User template"
+
+        # The first call only returns once the second one has started, which a sequential loop never does
+        second_call_started = threading.Event()
+        first_call_done = threading.Event()
+        first_call_released = []
+        call_numbers = []
+        call_numbers_lock = threading.Lock()
+
+        def call_model(*args):
+            with call_numbers_lock:
+                call_numbers.append(len(call_numbers) + 1)
+                call_number = call_numbers[-1]
+            if call_number == 1:
+                first_call_released.append(second_call_started.wait(timeout=5))
+                first_call_done.set()
+                return "Invalid"
+            second_call_started.set()
+            return "<system_prompt>Optimized system</system_prompt><user_prompt>Optimized user</user_prompt>"
+        self.inference_adapter.call_model.side_effect = call_model
+        self.optimizer._format_prompt_with_variables = Mock()
+
+        result = self.optimizer.optimize(max_retries=5, num_parallel_attempts=2)
+
+        self.assertIsNotNone(result)
+        self.assertTrue(first_call_done.wait(timeout=5))
+        self.assertEqual(first_call_released, [True])
+        # The valid second response ends the run, the first call finishing later starts no replacement
+        self.assertEqual(call_numbers, [1, 2])
+        self.optimizer._format_prompt_with_variables.assert_not_called()
+
+    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_meta_prompter.nova_mp_optimizer.ThreadPoolExecutor')
+    def test_optimize_single_attempt_runs_inline(self, mock_executor_class):
+        """Test the default single attempt calls the model on the calling thread without a thread pool"""
+        self.prompt_adapter.fetch.return_value = {
+            'system': {'variables': []},
+            'user': {'variables': []}
+        }
+        self.prompt_adapter.fetch_system_template.return_value = "System template"
+        self.prompt_adapter.fetch_user_template.return_value = "User template"
+
+        calling_threads = []
+        self.inference_adapter.call_model.side_effect = lambda *args: (
+            calling_threads.append(threading.current_thread()) or
+            "<system_prompt>Optimized system</system_prompt><user_prompt>Optimized user</user_prompt>"
+        )
+
+        result = self.optimizer.optimize()
+
+        self.assertIsNotNone(result)
+        mock_executor_class.assert_not_called()
+        self.assertEqual(calling_threads, [threading.current_thread()])
+
+    def test_optimize_cache_hit(self):
+        """Test identical optimize calls reuse the cached optimized prompt"""
+        self.prompt_adapter.fetch.return_value = {
+            'system': {'variables': []},
+            'user': {'variables': []}
+        }
+        self.prompt_adapter.fetch_system_template.return_value = "System template"
+        self.prompt_adapter.fetch_user_template.return_value = "User template"
+
+        self.inference_adapter.call_model.return_value = (
+            "<system_prompt>Optimized system</system_prompt>"
+            "<user_prompt>Optimized user</user_prompt>"
+        )
+
+        self.optimizer.optimize()
+        self.optimizer.optimize()
+        self.inference_adapter.call_model.assert_called_once()
+
+        # Bypassing the cache always calls the model
+        self.optimizer.optimize(use_cache=False)
+        self.assertEqual(self.inference_adapter.call_model.call_count, 2)
+
+    def test_optimize_meta_prompt_variables_sorted(self):
+        """Test prompt variables are rendered into the meta prompt in a stable order"""
+        self.prompt_adapter.fetch.return_value = {
+            'user_prompt': {'variables': ['var2', 'var1']},
+            'system_prompt': {'variables': []}
+        }
+        self.prompt_adapter.fetch_system_template.return_value = "System template"
+        self.prompt_adapter.fetch_user_template.return_value = "User template {{var1}} {{var2}}"
+
+        self.inference_adapter.call_model.return_value = (
+            "<system_prompt>Optimized system</system_prompt>"
+            "<user_prompt>Optimized user {{var1}} {{var2}}</user_prompt>"
+        )
+
+        self.optimizer.optimize()
+
+        meta_prompt = self.inference_adapter.call_model.call_args[0][1]
+        self.assertIn("{{var1}}, {{var2}}", meta_prompt)
@@ -1,53 +1,75 @@
 import unittest
-from unittest.mock import Mock, PropertyMock, patch
+from unittest.mock import Mock, patch
 
 from amzn_nova_prompt_optimizer.core.inference import InferenceAdapter
 from amzn_nova_prompt_optimizer.core.input_adapters.dataset_adapter import DatasetAdapter
 from amzn_nova_prompt_optimizer.core.input_adapters.metric_adapter import MetricAdapter
 from amzn_nova_prompt_optimizer.core.input_adapters.prompt_adapter import PromptAdapter
 from amzn_nova_prompt_optimizer.core.optimizers import NovaPromptOptimizer, NovaMPOptimizationAdapter
+from amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer import MAX_NUM_THREADS
 
 
+_MODULE_PATH = "amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer"
+_MIPRO_PATH = f"{_MODULE_PATH}.NovaMIPROv2OptimizationAdapter"
+
+# Opaque handles that are only passed through and compared, shared by every test in the module
+_INFERENCE_ADAPTER = Mock(spec=InferenceAdapter)
+_METRIC_ADAPTER = Mock(spec=MetricAdapter)
+
+# MIPROv2 optimize() arguments shared by every predefined mode, with the default rate limit of 2
+_DEFAULT_OPTIMIZE_KWARGS = {
+    "num_candidates": 20,
+    "num_trials": 30,
+    "max_bootstrapped_demos": 4,
+    "max_labeled_demos": 4,
+    "num_threads": 2,
+    "enable_json_fallback": False
+}
+
+
+class _FakePromptAdapter:
+    """Opaque stand-in for prompt adapters that are only passed along and checked by identity"""
+    __slots__ = ()
+
+
+@patch(_MIPRO_PATH)
 class TestNovaPromptOptimizer(unittest.TestCase):
-    def setUp(self):
-        self.mock_variables = {"var1": "value1", "var2": "value2"}
-        self.prompt_adapter = Mock(spec=PromptAdapter)
-        self.prompt_adapter.variables = self.mock_variables
-        # Create a mock PromptAdapter class that can be instantiated
-        self.mock_prompt_adapter_class = Mock()
-        self.mock_prompt_adapter_instance = Mock(spec=PromptAdapter)
-        self.mock_prompt_adapter_class.return_value = self.mock_prompt_adapter_instance
-        self.prompt_adapter.__class__ = self.mock_prompt_adapter_class
-        self.dataset_adapter = Mock(spec=DatasetAdapter)
-        # Configure the input_columns property
-        type(self.dataset_adapter).input_columns = PropertyMock(
-            return_value=["input1", "input2"]
+    # Expected MIPROv2 task model per mode, None exercises the default mode
+    MODE_MAP = {
+        None: "us.amazon.nova-pro-v1:0",
+        "micro": "us.amazon.nova-micro-v1:0",
+        "lite": "us.amazon.nova-lite-v1:0",
+        "pro": "us.amazon.nova-pro-v1:0",
+        "premier": "us.amazon.nova-premier-v1:0"
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        # The adapters are only passed through to the code under test and never asserted on, so they are
+        # built once per class. Per-test state is configured in setUp.
+        cls.mock_variables = {"var1": "value1", "var2": "value2"}
+
+        cls.prompt_adapter = Mock(spec=PromptAdapter)
+        cls.prompt_adapter.variables = cls.mock_variables
+        cls.dataset_adapter = Mock(spec=DatasetAdapter)
+        cls.inference_adapter = _INFERENCE_ADAPTER
+        cls.metric_adapter = _METRIC_ADAPTER
+
+        cls.nova_prompt_optimizer = NovaPromptOptimizer(
+            prompt_adapter=cls.prompt_adapter,
+            inference_adapter=cls.inference_adapter,
+            dataset_adapter=cls.dataset_adapter,
+            metric_adapter=cls.metric_adapter
         )
-        # Configure the output_columns property
-        type(self.dataset_adapter).output_columns = PropertyMock(
-            return_value=["output1"]
-        )
-        self.dataset_adapter.fetch.return_value = [
-            {
-                "inputs": {"input1": "test input 1"},
-                "outputs": {"output1": "test output 1"}
-            },
-            {
-                "inputs": {"input1": "test input 2"},
-                "outputs": {"output1": "test output 2"}
-            }
-        ]
-        self.inference_adapter = Mock(spec=InferenceAdapter)
-        self.metric_adapter = Mock(spec=MetricAdapter)
 
-        self.nova_prompt_optimizer = NovaPromptOptimizer(
-            prompt_adapter=self.prompt_adapter,
-            inference_adapter=self.inference_adapter,
-            dataset_adapter=self.dataset_adapter,
-            metric_adapter=self.metric_adapter
-        )
+    def setUp(self):
+        # Tests may change the rate limit, the dataset size and stub the meta prompting step, reset them so they
+        # stay independent
+        self.inference_adapter.rate_limit = 2
+        self.dataset_adapter.fetch.return_value = [{}] * 10
+        self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock()
 
-    def test_optimize_no_inference_adapter(self):
+    def test_optimize_no_inference_adapter(self, mock_miprov2_class):
         # Create NovaPromptOptimizer instance without inference_adapter
         nova_prompt_optimizer_no_inference = NovaPromptOptimizer(
             prompt_adapter=self.prompt_adapter,
@@ -62,7 +84,7 @@ class TestNovaPromptOptimizer(unittest.TestCase):
 
         self.assertTrue("Inference Adapter not passed." in str(context.exception))
 
-    def test_optimize_no_dataset_adapter(self):
+    def test_optimize_no_dataset_adapter(self, mock_miprov2_class):
         nova_prompt_optimizer_no_dataset = NovaPromptOptimizer(
             prompt_adapter=self.prompt_adapter,
             inference_adapter=self.inference_adapter,
@@ -70,7 +92,7 @@ class TestNovaPromptOptimizer(unittest.TestCase):
             metric_adapter=self.metric_adapter
         )
 
-        mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
+        mock_intermediate_prompt_adapter = _FakePromptAdapter()
         nova_prompt_optimizer_no_dataset.meta_prompt_optimization_adapter.optimize = Mock(return_value=mock_intermediate_prompt_adapter)
 
         result = nova_prompt_optimizer_no_dataset.optimize()
@@ -78,7 +100,7 @@ class TestNovaPromptOptimizer(unittest.TestCase):
         self.assertIs(result, mock_intermediate_prompt_adapter)
         nova_prompt_optimizer_no_dataset.meta_prompt_optimization_adapter.optimize.assert_called_once()
 
-    def test_optimize_no_metric_adapter(self):
+    def test_optimize_no_metric_adapter(self, mock_miprov2_class):
         nova_prompt_optimizer_no_metric = NovaPromptOptimizer(
             prompt_adapter=self.prompt_adapter,
             inference_adapter=self.inference_adapter,
@@ -86,7 +108,7 @@ class TestNovaPromptOptimizer(unittest.TestCase):
             metric_adapter=None
         )
 
-        mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
+        mock_intermediate_prompt_adapter = _FakePromptAdapter()
         nova_prompt_optimizer_no_metric.meta_prompt_optimization_adapter.optimize = Mock(return_value=mock_intermediate_prompt_adapter)
 
         result = nova_prompt_optimizer_no_metric.optimize()
@@ -94,84 +116,49 @@ class TestNovaPromptOptimizer(unittest.TestCase):
         self.assertIs(result, mock_intermediate_prompt_adapter)
         nova_prompt_optimizer_no_metric.meta_prompt_optimization_adapter.optimize.assert_called_once()
 
-    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer.NovaMIPROv2OptimizationAdapter')
-    def test_optimize_with_all_adapters_default_mode(self, mock_miprov2_class):
-        # Setup mocks
-        mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
-        mock_final_prompt_adapter = Mock(spec=PromptAdapter)
-        
-        self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock(
-            return_value=mock_intermediate_prompt_adapter
-        )
-        
-        mock_miprov2_instance = Mock()
+    def test_optimize_modes(self, mock_miprov2_class):
+        mock_intermediate_prompt_adapter = _FakePromptAdapter()
+        mock_final_prompt_adapter = _FakePromptAdapter()
+        mock_meta_prompt_optimize = self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize
+        mock_meta_prompt_optimize.return_value = mock_intermediate_prompt_adapter
+        mock_miprov2_instance = mock_miprov2_class.return_value
         mock_miprov2_instance.optimize.return_value = mock_final_prompt_adapter
-        mock_miprov2_class.return_value = mock_miprov2_instance
-        
-        # Test default mode (pro)
-        result = self.nova_prompt_optimizer.optimize()
-        
-        # Verify meta prompt optimization was called
-        self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize.assert_called_once_with(
-            prompter_model_id="us.amazon.nova-premier-v1:0"
-        )
-        
-        # Verify MIPROv2 was initialized and called
-        mock_miprov2_class.assert_called_once_with(
-            prompt_adapter=mock_intermediate_prompt_adapter,
-            dataset_adapter=self.dataset_adapter,
-            metric_adapter=self.metric_adapter,
-            inference_adapter=self.inference_adapter
-        )
-        
-        mock_miprov2_instance.optimize.assert_called_once_with(
-            prompter_model_id="us.amazon.nova-premier-v1:0",
-            task_model_id="us.amazon.nova-pro-v1:0",
-            num_candidates=20,
-            num_trials=30,
-            max_bootstrapped_demos=4,
-            max_labeled_demos=4,
-            enable_json_fallback=False
-        )
-        
-        self.assertIs(result, mock_final_prompt_adapter)
 
-    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer.NovaMIPROv2OptimizationAdapter')
-    def test_optimize_with_lite_mode(self, mock_miprov2_class):
-        mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
-        mock_final_prompt_adapter = Mock(spec=PromptAdapter)
-        
-        self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock(
-            return_value=mock_intermediate_prompt_adapter
-        )
-        
-        mock_miprov2_instance = Mock()
-        mock_miprov2_instance.optimize.return_value = mock_final_prompt_adapter
-        mock_miprov2_class.return_value = mock_miprov2_instance
-        
-        result = self.nova_prompt_optimizer.optimize(mode="lite")
+        for mode, task_model_id in self.MODE_MAP.items():
+            with self.subTest(mode=mode):
+                # Resetting clears recorded calls but keeps the configured return values
+                mock_meta_prompt_optimize.reset_mock()
+                mock_miprov2_class.reset_mock()
 
-        # Verify meta prompt optimization was called
-        self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize.assert_called_once_with(
-            prompter_model_id="us.amazon.nova-premier-v1:0"
-        )
-        
-        mock_miprov2_instance.optimize.assert_called_once_with(
-            prompter_model_id="us.amazon.nova-premier-v1:0",
-            task_model_id="us.amazon.nova-lite-v1:0",
-            num_candidates=20,
-            num_trials=30,
-            max_bootstrapped_demos=4,
-            max_labeled_demos=4,
-            enable_json_fallback=False
-        )
-        
-        self.assertIs(result, mock_final_prompt_adapter)
+                if mode is None:
+                    result = self.nova_prompt_optimizer.optimize()
+                else:
+                    result = self.nova_prompt_optimizer.optimize(mode=mode)
+
+                # Verify meta prompt optimization was called
+                mock_meta_prompt_optimize.assert_called_once_with(
+                    prompter_model_id="us.amazon.nova-premier-v1:0"
+                )
+
+                # Verify MIPROv2 was initialized and called
+                mock_miprov2_class.assert_called_once_with(
+                    prompt_adapter=mock_intermediate_prompt_adapter,
+                    dataset_adapter=self.dataset_adapter,
+                    metric_adapter=self.metric_adapter,
+                    inference_adapter=self.inference_adapter
+                )
+
+                mock_miprov2_instance.optimize.assert_called_once_with(
+                    prompter_model_id="us.amazon.nova-premier-v1:0",
+                    task_model_id=task_model_id,
+                    **_DEFAULT_OPTIMIZE_KWARGS
+                )
+
+                self.assertIs(result, mock_final_prompt_adapter)
 
-    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer.NovaMIPROv2OptimizationAdapter')
     def test_optimize_with_custom_mode(self, mock_miprov2_class):
-        mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
-        mock_final_prompt_adapter = Mock(spec=PromptAdapter)
+        mock_intermediate_prompt_adapter = _FakePromptAdapter()
+        mock_final_prompt_adapter = _FakePromptAdapter()
         
         self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock(
             return_value=mock_intermediate_prompt_adapter
@@ -202,15 +189,15 @@ class TestNovaPromptOptimizer(unittest.TestCase):
             num_trials=15,
             max_bootstrapped_demos=2,
             max_labeled_demos=3,
+            num_threads=2,
             enable_json_fallback=False
         )
         
         self.assertIs(result, mock_final_prompt_adapter)
 
-    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer.NovaMIPROv2OptimizationAdapter')
     def test_optimize_with_custom_mode_no_meta_prompt_model_id(self, mock_miprov2_class):
-        mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
-        mock_final_prompt_adapter = Mock(spec=PromptAdapter)
+        mock_intermediate_prompt_adapter = _FakePromptAdapter()
+        mock_final_prompt_adapter = _FakePromptAdapter()
 
         self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock(
             return_value=mock_intermediate_prompt_adapter
@@ -238,34 +225,29 @@ class TestNovaPromptOptimizer(unittest.TestCase):
             num_trials=15,
             max_bootstrapped_demos=2,
             max_labeled_demos=3,
+            num_threads=2,
             enable_json_fallback=False
         )
 
         self.assertIs(result, mock_final_prompt_adapter)
 
-    def test_optimize_custom_mode_no_params(self):
-        with self.assertRaises(ValueError) as context:
-            self.nova_prompt_optimizer.optimize(mode="custom")
-        
-        self.assertIn("Custom mode requires custom_params dictionary", str(context.exception))
-
-    def test_optimize_custom_mode_missing_required_keys(self):
-        incomplete_params = {
-            "task_model_id": "custom-model",
-            "num_candidates": 10
+    def test_optimize_custom_mode_invalid_params(self, mock_miprov2_class):
+        cases = [
+            (None, "Custom mode requires custom_params dictionary"),
             # Missing other required keys
-        }
-        
-        with self.assertRaises(ValueError) as context:
-            self.nova_prompt_optimizer.optimize(mode="custom", custom_params=incomplete_params)
-        
-        self.assertIn("custom_params must contain all required keys", str(context.exception))
+            ({"task_model_id": "custom-model", "num_candidates": 10}, "custom_params must contain all required keys")
+        ]
+        for custom_params, message in cases:
+            with self.subTest(custom_params=custom_params):
+                with self.assertRaises(ValueError) as context:
+                    self.nova_prompt_optimizer.optimize(mode="custom", custom_params=custom_params)
 
-    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer.NovaMIPROv2OptimizationAdapter')
-    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer.logger')
+                self.assertIn(message, str(context.exception))
+
+    @patch(f"{_MODULE_PATH}.logger")
     def test_optimize_invalid_mode_defaults_to_pro(self, mock_logger, mock_miprov2_class):
-        mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
-        mock_final_prompt_adapter = Mock(spec=PromptAdapter)
+        mock_intermediate_prompt_adapter = _FakePromptAdapter()
+        mock_final_prompt_adapter = _FakePromptAdapter()
 
         self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock(
             return_value=mock_intermediate_prompt_adapter
@@ -297,52 +279,51 @@ class TestNovaPromptOptimizer(unittest.TestCase):
         mock_miprov2_instance.optimize.assert_called_once_with(
             prompter_model_id="us.amazon.nova-premier-v1:0",
             task_model_id="us.amazon.nova-pro-v1:0",
-            num_candidates=20,
-            num_trials=30,
-            max_bootstrapped_demos=4,
-            max_labeled_demos=4,
-            enable_json_fallback=False
+            **_DEFAULT_OPTIMIZE_KWARGS
         )
 
         self.assertIs(result, mock_final_prompt_adapter)
 
-    @patch('amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer.NovaMIPROv2OptimizationAdapter')
-    def test_optimize_all_modes(self, mock_miprov2_class):
-        modes = ["micro", "lite", "pro", "premier"]
-        expected_task_models = {
-            "micro": "us.amazon.nova-micro-v1:0",
-            "lite": "us.amazon.nova-lite-v1:0",
-            "pro": "us.amazon.nova-pro-v1:0",
-            "premier": "us.amazon.nova-premier-v1:0"
+    def test_optimize_num_threads(self, mock_miprov2_class):
+        self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock(
+            return_value=_FakePromptAdapter()
+        )
+        mock_miprov2_instance = Mock()
+        mock_miprov2_class.return_value = mock_miprov2_instance
+
+        # Threads follow the inference rate limit
+        self.inference_adapter.rate_limit = 8
+        self.nova_prompt_optimizer.optimize()
+        self.assertEqual(mock_miprov2_instance.optimize.call_args.kwargs["num_threads"], 8)
+
+        # Capped at a fixed ceiling for high rate limits
+        self.inference_adapter.rate_limit = 1000
+        self.dataset_adapter.fetch.return_value = [{}] * 1000
+        self.nova_prompt_optimizer.optimize()
+        self.assertEqual(mock_miprov2_instance.optimize.call_args.kwargs["num_threads"], MAX_NUM_THREADS)
+
+        # Capped at the number of dataset rows, but never below one thread
+        self.dataset_adapter.fetch.return_value = [{}] * 3
+        self.nova_prompt_optimizer.optimize()
+        self.assertEqual(mock_miprov2_instance.optimize.call_args.kwargs["num_threads"], 3)
+
+        self.dataset_adapter.fetch.return_value = []
+        self.nova_prompt_optimizer.optimize()
+        self.assertEqual(mock_miprov2_instance.optimize.call_args.kwargs["num_threads"], 1)
+
+        # Disabled rate limiting falls back to the default
+        self.inference_adapter.rate_limit = 0
+        self.nova_prompt_optimizer.optimize()
+        self.assertEqual(mock_miprov2_instance.optimize.call_args.kwargs["num_threads"], 2)
+
+        # custom_params take precedence
+        custom_params = {
+            "task_model_id": "custom-model",
+            "num_candidates": 10,
+            "num_trials": 15,
+            "max_bootstrapped_demos": 2,
+            "max_labeled_demos": 3,
+            "num_threads": 4
         }
-        
-        for mode in modes:
-            with self.subTest(mode=mode):
-                mock_intermediate_prompt_adapter = Mock(spec=PromptAdapter)
-                mock_final_prompt_adapter = Mock(spec=PromptAdapter)
-                
-                self.nova_prompt_optimizer.meta_prompt_optimization_adapter.optimize = Mock(
-                    return_value=mock_intermediate_prompt_adapter
-                )
-                
-                mock_miprov2_instance = Mock()
-                mock_miprov2_instance.optimize.return_value = mock_final_prompt_adapter
-                mock_miprov2_class.return_value = mock_miprov2_instance
-                
-                result = self.nova_prompt_optimizer.optimize(mode=mode)
-                
-                mock_miprov2_instance.optimize.assert_called_with(
-                    prompter_model_id="us.amazon.nova-premier-v1:0",
-                    task_model_id=expected_task_models[mode],
-                    num_candidates=20,
-                    num_trials=30,
-                    max_bootstrapped_demos=4,
-                    max_labeled_demos=4,
-                    enable_json_fallback=False
-                )
-                
-                self.assertIs(result, mock_final_prompt_adapter)
-                
-                # Reset mocks for next iteration
-                mock_miprov2_class.reset_mock()
-                mock_miprov2_instance.reset_mock()
+        self.nova_prompt_optimizer.optimize(mode="custom", custom_params=custom_params)
+        self.assertEqual(mock_miprov2_instance.optimize.call_args.kwargs["num_threads"], 4)
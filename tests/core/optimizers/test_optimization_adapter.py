@@ -8,6 +8,12 @@ from amzn_nova_prompt_optimizer.core.input_adapters.prompt_adapter import Prompt
 from amzn_nova_prompt_optimizer.core.optimizers.adapter import OptimizationAdapter
 
 
+# Concrete implementation of the abstract class for testing
+class _ConcreteOptimizationAdapter(OptimizationAdapter):
+    def optimize(self) -> PromptAdapter:
+        return self.prompt_adapter
+
+
 class TestOptimizationAdapter(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures before each test method."""
@@ -16,12 +22,7 @@ class TestOptimizationAdapter(unittest.TestCase):
         self.dataset_adapter = Mock(spec=DatasetAdapter)
         self.metric_adapter = Mock(spec=MetricAdapter)
 
-        # Create a concrete implementation of the abstract class for testing
-        class ConcreteOptimizationAdapter(OptimizationAdapter):
-            def optimize(self) -> PromptAdapter:
-                return self.prompt_adapter
-
-        self.optimization_adapter = ConcreteOptimizationAdapter(
+        self.optimization_adapter = _ConcreteOptimizationAdapter(
             prompt_adapter=self.prompt_adapter,
             inference_adapter=self.inference_adapter,
             dataset_adapter=self.dataset_adapter,
@@ -30,18 +31,18 @@ class TestOptimizationAdapter(unittest.TestCase):
 
     def test_initialization(self):
         """Test if the OptimizationAdapter initializes correctly with all parameters."""
-        self.assertEqual(self.optimization_adapter.prompt_adapter, self.prompt_adapter)
-        self.assertEqual(self.optimization_adapter.inference_adapter, self.inference_adapter)
-        self.assertEqual(self.optimization_adapter.dataset_adapter, self.dataset_adapter)
-        self.assertEqual(self.optimization_adapter.metric_adapter, self.metric_adapter)
+        self.assertIs(self.optimization_adapter.prompt_adapter, self.prompt_adapter)
+        self.assertIs(self.optimization_adapter.inference_adapter, self.inference_adapter)
+        self.assertIs(self.optimization_adapter.dataset_adapter, self.dataset_adapter)
+        self.assertIs(self.optimization_adapter.metric_adapter, self.metric_adapter)
 
     def test_initialization_with_optional_params(self):
         """Test initialization with optional parameters as None."""
-        optimization_adapter = self.optimization_adapter.__class__(
+        optimization_adapter = _ConcreteOptimizationAdapter(
             prompt_adapter=self.prompt_adapter
         )
 
-        self.assertEqual(optimization_adapter.prompt_adapter, self.prompt_adapter)
+        self.assertIs(optimization_adapter.prompt_adapter, self.prompt_adapter)
         self.assertIsNone(optimization_adapter.inference_adapter)
         self.assertIsNone(optimization_adapter.dataset_adapter)
         self.assertIsNone(optimization_adapter.metric_adapter)
@@ -54,5 +55,4 @@ class TestOptimizationAdapter(unittest.TestCase):
     def test_optimize_method_implementation(self):
         """Test that the optimize method returns a PromptAdapter."""
         result = self.optimization_adapter.optimize()
-        self.assertIsInstance(result, Mock)
-        self.assertEqual(result, self.prompt_adapter)
+        self.assertIs(result, self.prompt_adapter)
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+import unittest
+
+import amzn_nova_prompt_optimizer.core.optimizers as optimizers
+from amzn_nova_prompt_optimizer.core.optimizers.nova_prompt_optimizer.nova_prompt_optimizer import NovaPromptOptimizer
+
+
+class TestOptimizersPackage(unittest.TestCase):
+    def test_star_import_exports_lazy_optimizers(self):
+        """Test that a star import still exports the lazily imported optimizers"""
+        namespace = {}
+        exec("from amzn_nova_prompt_optimizer.core.optimizers import *", namespace)
+
+        self.assertIs(namespace["NovaPromptOptimizer"], NovaPromptOptimizer)
+        self.assertIn("MIPROv2OptimizationAdapter", namespace)
+        self.assertIn("NovaMPOptimizationAdapter", namespace)
+        self.assertIn("OptimizationAdapter", namespace)
+
+    def test_dir_lists_lazy_optimizers(self):
+        """Test that dir() lists the lazily imported optimizers once"""
+        names = dir(optimizers)
+
+        self.assertEqual(names.count("NovaPromptOptimizer"), 1)
+        self.assertEqual(names.count("MIPROv2OptimizationAdapter"), 1)
+
+    def test_lazy_optimizer_bound_after_first_access(self):
+        """Test that a resolved optimizer is bound on the package"""
+        self.assertIs(optimizers.NovaPromptOptimizer, NovaPromptOptimizer)
+        self.assertIs(vars(optimizers)["NovaPromptOptimizer"], NovaPromptOptimizer)
+
+    def test_meta_prompter_import_skips_dspy(self):
+        """Test that importing NovaMPOptimizationAdapter does not load dspy or litellm"""
+        # Run in a fresh interpreter, this process already imported dspy through the other optimizers
+        code = ("import sys\n"
+                "from amzn_nova_prompt_optimizer.core.optimizers import NovaMPOptimizationAdapter\n"
+                "print(sorted(name for name in ('dspy', 'litellm') if name in sys.modules))")
+
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+        self.assertEqual(result.stdout.strip(), "[]")
@@ -1,6 +1,6 @@
 import threading
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import time
 
@@ -11,73 +11,96 @@ class TestRateLimiter(unittest.TestCase):
     def setUp(self):
         self.rate_limiter = RateLimiter(rate_limit=5)
 
-    @patch('time.time')
-    @patch('time.sleep')
-    def test_rate_limit_disabled(self, mock_sleep, mock_time):
+    def _use_fake_clock(self, mock_time, start_time):
+        """Make the patched time module a clock that only moves forward while waiting, return the wait mock"""
+        clock = [start_time]
+        mock_time.monotonic.side_effect = lambda: clock[0]
+
+        def wait(timeout=None):
+            clock[0] += timeout
+        self.rate_limiter._slot_freed = Mock(wait=Mock(side_effect=wait))
+        return self.rate_limiter._slot_freed.wait
+
+    def _occupy_slot(self, age):
+        """Fill a rate_limit 1 window with a request admitted age seconds ago, return its timestamp"""
+        self.rate_limiter.rate_limit = 1
+        request_time = time.monotonic() - age
+        self.rate_limiter._set_state([request_time])
+        return request_time
+
+    def _wait_for_waiting_requests(self, count, timeout=2.0):
+        """Block until count requests are waiting for a slot, fail after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while self.rate_limiter.waiting_requests_count < count:
+            self.assertLess(time.monotonic(), deadline, f"Timed out waiting for {count} waiting requests")
+            time.sleep(0.01)
+
+    def _join(self, *threads, timeout=5.0):
+        """Join the threads, fail if any of them is still running after timeout seconds"""
+        for thread in threads:
+            thread.join(timeout)
+            self.assertFalse(thread.is_alive(), "Thread still running")
+
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_rate_limit_disabled(self, mock_time):
         """Test rate limiting disabled when rate_limit <=0 """
         # Arrange
-        mock_time.return_value = 100.0
+        wait = self._use_fake_clock(mock_time, 100.0)
         self.rate_limiter.rate_limit = -1
 
         # Act
         self.rate_limiter.apply_rate_limiting()
 
         # Assert
-        mock_sleep.assert_not_called()
+        wait.assert_not_called()
         self.assertEqual(len(self.rate_limiter.request_timestamps), 0)  # No request timestamps recorded
         self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
 
-    @patch('time.time')
-    @patch('time.sleep')
-    def test_apply_rate_limiting_no_limit_reached(self, mock_sleep, mock_time):
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_no_limit_reached(self, mock_time):
         """Test rate limiting when limit is not reached"""
         # Arrange
-        mock_time.return_value = 100.0
+        wait = self._use_fake_clock(mock_time, 100.0)
         self.rate_limiter.rate_limit = 5
 
         # Add some timestamps that are within rate limit
-        self.rate_limiter.request_timestamps = [99.5, 99.7, 99.9]  # 3 requests in last second
+        self.rate_limiter._set_state([99.5, 99.7, 99.9])  # 3 requests in last second
 
         # Act
         self.rate_limiter.apply_rate_limiting()
 
         # Assert
-        mock_sleep.assert_not_called()
+        wait.assert_not_called()
         self.assertEqual(len(self.rate_limiter.request_timestamps), 4)  # Original 3 + 1 new
         self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
 
-    @patch('time.time')
-    @patch('time.sleep')
-    @patch('random.uniform')
-    def test_apply_rate_limiting_limit_reached(self, mock_random, mock_sleep, mock_time):
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_limit_reached(self, mock_time):
         """Test rate limiting when limit is reached"""
         # Arrange
-        mock_time.side_effect = [100.0, 100.0, 100.1]  # Current time calls
-        mock_random.return_value = 0.9
+        wait = self._use_fake_clock(mock_time, 100.0)
         self.rate_limiter.rate_limit = 3
 
         # Fill up to rate limit
-        self.rate_limiter.request_timestamps = [99.5, 99.7, 99.9]  # 3 requests in last second
+        self.rate_limiter._set_state([99.5, 99.7, 99.9])  # 3 requests in last second
 
         # Act
         self.rate_limiter.apply_rate_limiting()
 
         # Assert
-        mock_sleep.assert_called_once()
-        # Verify sleep time is positive (exact value depends on random component)
-        sleep_args = mock_sleep.call_args[0]
-        self.assertGreater(sleep_args[0], 0)
-
-    @patch('time.time')
-    @patch('time.sleep')
-    def test_apply_rate_limiting_old_timestamps_removed(self, mock_sleep, mock_time):
+        wait.assert_called_once()
+        # Verify wait time is positive
+        self.assertGreater(wait.call_args[0][0], 0)
+
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_old_timestamps_removed(self, mock_time):
         """Test that old timestamps are properly removed"""
         # Arrange
-        mock_time.return_value = 100.0
+        mock_time.monotonic.return_value = 100.0
         self.rate_limiter.rate_limit = 5
 
         # Add timestamps - some old (>1 second) and some recent
-        self.rate_limiter.request_timestamps = [98.5, 98.8, 99.2, 99.5, 99.8]  # Mix of old and recent
+        self.rate_limiter._set_state([98.5, 98.8, 99.2, 99.5, 99.8])  # Mix of old and recent
 
         # Act
         self.rate_limiter.apply_rate_limiting()
@@ -85,45 +108,40 @@ class TestRateLimiter(unittest.TestCase):
         # Assert
         # Only timestamps from last second should remain (99.2, 99.5, 99.8) + new one
         self.assertEqual(len(self.rate_limiter.request_timestamps), 4)
-        for timestamp in self.rate_limiter.request_timestamps[:-1]:  # Exclude the newly added one
+        for timestamp in list(self.rate_limiter.request_timestamps)[:-1]:  # Exclude the newly added one
             self.assertGreaterEqual(timestamp, 99.0)  # All should be within last second
 
-    @patch('time.time')
-    @patch('time.sleep')
-    @patch('random.uniform')
-    def test_apply_rate_limiting_sleep_calculation(self, mock_random, mock_sleep, mock_time):
-        """Test sleep time calculation with predictable random value"""
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_wait_calculation(self, mock_time):
+        """Test that a throttled request waits until the oldest request leaves the window"""
         # Arrange
-        mock_time.side_effect = [100.0, 100.0, 100.1]
-        mock_random.return_value = 0.5  # Fixed random value for predictable testing
+        wait = self._use_fake_clock(mock_time, 100.0)
         self.rate_limiter.rate_limit = 2
 
         # Set up scenario where rate limit is reached
-        self.rate_limiter.request_timestamps = [99.5, 99.8]  # 2 requests, rate limit is 2
-        self.rate_limiter.waiting_requests_count = 0
+        self.rate_limiter._set_state([99.5, 99.8])  # 2 requests, rate limit is 2
 
         # Act
-        self.rate_limiter.apply_rate_limiting()
+        request_time = self.rate_limiter.apply_rate_limiting()
 
         # Assert
-        mock_sleep.assert_called_once()
-        # Verify the sleep calculation: ((waiting_requests_count/rate_limit) * 1.0) - (current_time - oldest_timestamp) + random
-        # Expected: ((1/2) * 1.0) - (100.0 - 99.5) + 0.5 = 0.5 - 0.5 + 0.5 = 0.5
-        expected_sleep_time = 0.5
-        actual_sleep_time = mock_sleep.call_args[0][0]
-        self.assertAlmostEqual(actual_sleep_time, expected_sleep_time, places=2)
-
-    @patch('time.time')
-    @patch('time.sleep')
-    def test_apply_rate_limiting_waiting_requests_count_management(self, mock_sleep, mock_time):
+        wait.assert_called_once()
+        # Verify the wait calculation: 1.0 - (current_time - oldest_timestamp)
+        # Expected: 1.0 - (100.0 - 99.5) = 0.5
+        expected_wait_time = 0.5
+        actual_wait_time = wait.call_args[0][0]
+        self.assertAlmostEqual(actual_wait_time, expected_wait_time, places=2)
+        self.assertAlmostEqual(request_time, 100.5)
+
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_waiting_requests_count_management(self, mock_time):
         """Test waiting_requests_count is properly managed"""
         # Arrange
-        mock_time.side_effect = [100.0, 100.0, 100.1]
+        self._use_fake_clock(mock_time, 100.0)
         self.rate_limiter.rate_limit = 2
 
         # Set up scenario where rate limit is reached
-        self.rate_limiter.request_timestamps = [99.5, 99.8]
-        self.rate_limiter.waiting_requests_count = 0
+        self.rate_limiter._set_state([99.5, 99.8])
 
         # Act
         self.rate_limiter.apply_rate_limiting()
@@ -131,23 +149,21 @@ class TestRateLimiter(unittest.TestCase):
         # Assert
         self.assertEqual(self.rate_limiter.waiting_requests_count, 0)  # Should be decremented back to 0
 
-    @patch('time.time')
-    @patch('time.sleep')
-    def test_apply_rate_limiting_negative_sleep_time(self, mock_sleep, mock_time):
-        """Test that negative sleep times don't cause sleep"""
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_expired_window_no_wait(self, mock_time):
+        """Test that a window of expired timestamps doesn't cause a wait"""
         # Arrange
-        mock_time.side_effect = [100.0, 100.0, 100.1]
+        wait = self._use_fake_clock(mock_time, 100.0)
         self.rate_limiter.rate_limit = 2
 
-        # Set up scenario where calculated sleep time would be negative
-        self.rate_limiter.request_timestamps = [98.0, 98.5]  # Old timestamps
-        self.rate_limiter.waiting_requests_count = 0
+        # Set up scenario where the window is full of expired requests
+        self.rate_limiter._set_state([98.0, 98.5])  # Old timestamps
 
         # Act
         self.rate_limiter.apply_rate_limiting()
 
         # Assert
-        mock_sleep.assert_not_called()
+        wait.assert_not_called()
 
     def test_apply_rate_limiting_initialization_values(self):
         """Test that rate limiting attributes are properly initialized"""
@@ -156,69 +172,168 @@ class TestRateLimiter(unittest.TestCase):
 
         # Assert
         self.assertEqual(self.rate_limiter.rate_limit, 5)
-        self.assertEqual(self.rate_limiter.request_timestamps, [])
+        self.assertEqual(len(self.rate_limiter.request_timestamps), 0)
         self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
 
-    @patch('time.time')
-    @patch('time.sleep')
-    @patch('random.uniform')
-    def test_apply_rate_limiting_multiple_waiting_requests(self,mock_random, mock_sleep, mock_time):
+    def test_apply_rate_limiting_multiple_waiting_requests(self):
         """Test behavior with multiple waiting requests"""
         # Arrange
-        mock_time.side_effect = [100.0, 100.0, 100.1]
-        mock_random.return_value = 0.9
         self.rate_limiter.rate_limit = 2
-
-        # Set up scenario with multiple waiting requests
-        self.rate_limiter.request_timestamps = [99.5, 99.8]
-        self.rate_limiter.waiting_requests_count = 2  # Simulate multiple waiting requests
+        now = time.monotonic()
+        self.rate_limiter._set_state([now - 0.5, now - 0.4])  # Window is full
+        waiters = [threading.Thread(target=self.rate_limiter.apply_rate_limiting) for _ in range(2)]
 
         # Act
-        self.rate_limiter.apply_rate_limiting()
+        for waiter in waiters:
+            waiter.start()
+        self._wait_for_waiting_requests(2)
 
         # Assert
-        mock_sleep.assert_called_once()
         self.assertEqual(self.rate_limiter.waiting_requests_count, 2)
+        for request_time in list(self.rate_limiter.request_timestamps):
+            self.rate_limiter.release_request_slot(request_time)
+        self._join(*waiters)
+        self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
+        self.assertEqual(len(self.rate_limiter.request_timestamps), 2)
 
-    @patch('time.time')
-    @patch('time.sleep')
-    @patch('random.uniform')
-    def test_apply_rate_limiting_waiting_requests_count_floor(self,mock_random, mock_sleep, mock_time):
-        """Test that waiting_requests_count doesn't go below 0"""
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_interrupted_wait_leaves_queue(self, mock_time):
+        """Test that a request interrupted while waiting stops counting as waiting"""
         # Arrange
-        mock_time.return_value = 100.0
-        mock_random.return_value = 0.9
-        self.rate_limiter.rate_limit = 5
+        wait = self._use_fake_clock(mock_time, 100.0)
+        wait.side_effect = KeyboardInterrupt
+        self.rate_limiter.rate_limit = 2
+        self.rate_limiter._set_state([99.5, 99.8])
+
+        # Act
+        with self.assertRaises(KeyboardInterrupt):
+            self.rate_limiter.apply_rate_limiting()
 
-        # Set up scenario where waiting_requests_count would go negative
-        self.rate_limiter.request_timestamps = []
-        self.rate_limiter.waiting_requests_count = -1  # Start with negative value
+        # Assert
+        wait.assert_called_once()
+        self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
+        self.assertEqual(list(self.rate_limiter.request_timestamps), [99.5, 99.8])
+
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_short_wait(self, mock_time):
+        """Test that a request waits no longer than the oldest request needs to leave the window"""
+        # Arrange
+        wait = self._use_fake_clock(mock_time, 100.0)
+        self.rate_limiter.rate_limit = 2
+
+        # Set up scenario where the oldest request is about to leave the window
+        self.rate_limiter._set_state([99.1, 99.8])
 
         # Act
         self.rate_limiter.apply_rate_limiting()
 
         # Assert
-        self.assertEqual(self.rate_limiter.waiting_requests_count, 0)  # Should be reset to 0
+        # 99.1 leaves the window after 0.1 seconds
+        wait.assert_called_once()
+        self.assertAlmostEqual(wait.call_args[0][0], 0.1, places=2)
+        self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
+
+    def test_apply_rate_limiting_waits_without_lock(self):
+        """Test that a throttled request does not hold the lock while waiting"""
+        # Arrange
+        self._occupy_slot(age=0.5)
+        waiter = threading.Thread(target=self.rate_limiter.apply_rate_limiting)
+
+        # Act
+        waiter.start()
+        self._wait_for_waiting_requests(1)
+
+        # Assert
+        self.assertTrue(self.rate_limiter._lock.acquire(timeout=0.2))
+        self.rate_limiter._lock.release()
+        self._join(waiter)
+        self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
 
-    @patch('time.time')
-    @patch('time.sleep')
-    @patch('random.uniform')
-    def test_apply_rate_limiting_waiting_requests_negative_sleep(self, mock_random, mock_sleep, mock_time):
-        """Test behavior with multiple waiting requests"""
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_rechecks_window_after_wait(self, mock_time):
+        """Test that a request woken before a slot frees up waits again"""
         # Arrange
-        mock_time.side_effect = [100.0, 100.0, 100.1]
-        mock_random.return_value = 0.01 # low random value for testing negative sleep
+        wait = self._use_fake_clock(mock_time, 100.0)
+        advance_clock = wait.side_effect
         self.rate_limiter.rate_limit = 2
+        self.rate_limiter._set_state([99.5, 99.8])
 
-        # Set up scenario with multiple waiting requests
-        self.rate_limiter.request_timestamps = [99.1, 99.8]
-        self.rate_limiter.waiting_requests_count = 0
+        def wake_early_once(timeout=None):
+            if wait.call_count > 1:
+                advance_clock(timeout)
+        wait.side_effect = wake_early_once
 
         # Act
-        self.rate_limiter.apply_rate_limiting()
+        request_time = self.rate_limiter.apply_rate_limiting()
 
         # Assert
-        mock_sleep.assert_not_called()
+        self.assertEqual(wait.call_count, 2)
+        self.assertAlmostEqual(wait.call_args[0][0], 0.5)
+        self.assertAlmostEqual(request_time, 100.5)
+        self.assertEqual(list(self.rate_limiter.request_timestamps), [99.8, request_time])
+        self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
+
+    def test_apply_rate_limiting_newcomer_queues_behind_waiter(self):
+        """Test that a new request does not take a free slot while another request is waiting for one"""
+        # Arrange
+        occupied_slot = self._occupy_slot(age=0.5)
+        admitted = []
+        first = threading.Thread(target=lambda: admitted.append(("first", self.rate_limiter.apply_rate_limiting())))
+        second = threading.Thread(target=lambda: admitted.append(("second", self.rate_limiter.apply_rate_limiting())))
+
+        # Act
+        first.start()
+        self._wait_for_waiting_requests(1)
+        self.rate_limiter.release_request_slot(occupied_slot)  # The window has room, but the first request is waiting
+        second.start()
+        self._join(first, second)
+
+        # Assert
+        self.assertEqual([name for name, _ in admitted], ["first", "second"])
+        self.assertGreaterEqual(admitted[1][1] - admitted[0][1], 1.0)
+
+    @patch('amzn_nova_prompt_optimizer.util.rate_limiter.time')
+    def test_apply_rate_limiting_returns_request_time(self, mock_time):
+        """Test that the recorded timestamp is returned, and None when rate limiting is disabled"""
+        # Arrange
+        mock_time.monotonic.return_value = 100.0
+
+        # Act & Assert
+        self.assertEqual(self.rate_limiter.apply_rate_limiting(), 100.0)
+
+        self.rate_limiter.rate_limit = 0
+        self.assertIsNone(self.rate_limiter.apply_rate_limiting())
+
+    def test_release_request_slot(self):
+        """Test that releasing a slot removes only the given request's timestamp"""
+        # Arrange
+        self.rate_limiter._set_state([99.5, 99.7, 99.9])
+
+        # Act & Assert
+        self.rate_limiter.release_request_slot(99.7)
+        self.assertEqual(list(self.rate_limiter.request_timestamps), [99.5, 99.9])
+
+        self.rate_limiter.release_request_slot(98.0)  # Already expired, nothing to release
+        self.rate_limiter.release_request_slot(None)  # Admitted while rate limiting was disabled
+        self.assertEqual(list(self.rate_limiter.request_timestamps), [99.5, 99.9])
+
+    def test_release_request_slot_wakes_waiting_request(self):
+        """Test that a released slot goes to the waiting request right away"""
+        # Arrange
+        self.rate_limiter.rate_limit = 1
+        occupied_slot = self.rate_limiter.apply_rate_limiting()
+        admitted = []
+        waiter = threading.Thread(target=lambda: admitted.append(self.rate_limiter.apply_rate_limiting()))
+        waiter.start()
+        self._wait_for_waiting_requests(1)
+
+        # Act
+        self.rate_limiter.release_request_slot(occupied_slot)
+        self._join(waiter)
+
+        # Assert
+        # Without the wakeup the waiter would stay asleep until occupied_slot left the window
+        self.assertLess(admitted[0] - occupied_slot, 0.5)
         self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
 
     def test_thread_safety_concurrent_access(self):
@@ -233,10 +348,9 @@ class TestRateLimiter(unittest.TestCase):
             """Function to be run by each thread"""
             thread_results = []
             for _ in range(requests_per_thread):
-                start_time = time.time()
+                start_ns = time.perf_counter_ns()
                 self.rate_limiter.apply_rate_limiting()
-                end_time = time.time()
-                thread_results.append(end_time - start_time)
+                thread_results.append((time.perf_counter_ns() - start_ns) / 1e9)
             results.extend(thread_results)
         
         # Act
@@ -259,10 +373,61 @@ class TestRateLimiter(unittest.TestCase):
             self.assertIsInstance(timestamp, float)
             self.assertGreater(timestamp, 0)
 
+    def test_thread_safety_rate_limit_never_exceeded(self):
+        """Test that a concurrent burst never admits more than rate_limit requests in any 1 second window"""
+        # Arrange
+        self.rate_limiter.rate_limit = 4
+        num_threads = 6  # One full window, then the rest have to wait for it to move on
+        request_times = []
+
+        def make_request():
+            request_times.append(self.rate_limiter.apply_rate_limiting())
+
+        # Act
+        threads = [threading.Thread(target=make_request) for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        request_times.sort()
+        self.assertEqual(len(request_times), num_threads)
+        for i in range(len(request_times) - self.rate_limiter.rate_limit):
+            self.assertGreaterEqual(request_times[i + self.rate_limiter.rate_limit] - request_times[i], 1.0)
+
+    def test_thread_safety_bounded_wait_under_sustained_load(self):
+        """Test that under sustained load every request waits about as long as its place in the queue warrants"""
+        # Arrange
+        self.rate_limiter.rate_limit = 5
+        num_threads = 5
+        requests_per_thread = 2
+        waits = []
+
+        def make_requests():
+            for _ in range(requests_per_thread):
+                start = time.monotonic()
+                self.rate_limiter.apply_rate_limiting()
+                waits.append(time.monotonic() - start)
+                time.sleep(0.05)  # Simulated model call
+
+        # Act
+        threads = [threading.Thread(target=make_requests) for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        # The second round finds the window full of the first one and gets in once it expires, so no request
+        # should wait much longer than one window
+        self.assertEqual(len(waits), num_threads * requests_per_thread)
+        self.assertLess(max(waits), 1.3)
+
     def test_thread_safety_lock_acquisition(self):
         """Test that the lock is properly acquired and released"""
         # Arrange
-        self.rate_limiter.rate_limit = 1
+        self.rate_limiter.rate_limit = 2
         lock_acquired_count = 0
         
         # Mock the lock to count acquisitions
@@ -293,11 +458,14 @@ class TestRateLimiter(unittest.TestCase):
             threads.append(thread)
             thread.start()
         
-        for thread in threads:
-            thread.join()
+        self._join(*threads)
         
         # Assert
-        self.assertEqual(lock_acquired_count, 3)  # Each thread should acquire lock once
+        # Each request enters the lock once. The throttled one waits on the condition, which releases and
+        # re-acquires the underlying lock directly, bypassing CountingLock
+        self.assertEqual(lock_acquired_count, 3)
+        self.assertFalse(original_lock.locked())
+        self.assertEqual(self.rate_limiter.waiting_requests_count, 0)
 
     def test_thread_safety_no_race_conditions(self):
         """Test that no race conditions occur in timestamp list operations"""